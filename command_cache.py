@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Per-speaker read cache for LinkPlay commands
+Opt-in cache used by JAMSpeaker: read commands are kept for a per-command
+TTL, and sending a write drops the reads it affects. There is at most one
+entry per read command, so the cache needs no size bound.
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+# Read command -> seconds a cached answer stays valid
+DEFAULT_TTLS = {
+    'getStatus': 600,        # Name, MAC, firmware: almost never change
+    'getStatusEx': 600,
+    'getPlayerStatus': 2,    # Playback position moves constantly
+}
+
+# Write command prefix -> read commands it makes stale (None = everything)
+INVALIDATES = {
+    'setPlayerCmd': ('getPlayerStatus', 'getStatusEx'),   # getStatusEx carries vol
+    'setDeviceName': ('getStatus', 'getStatusEx'),
+    'wlanConnectApEx': None,
+}
+
+MISS = object()
+
+
+class CommandCache:
+    """TTL cache of command responses for one speaker
+
+    Commands not listed in ttls are treated as writes: they are never cached
+    and invalidate the reads listed in INVALIDATES (all reads if unknown).
+
+    Each read has an invalidation generation. A caller takes it with
+    generation() before sending the read and passes it to update(); if a
+    write invalidated that read in the meantime, the response (which may
+    predate the write) is not stored.
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = {}      # command -> (expires, response)
+        self._generations = {}  # command -> times invalidated
+        self._lock = threading.Lock()
+
+    def is_read(self, command: str) -> bool:
+        return command in self.ttls
+
+    def get(self, command: str):
+        """Cached response for a read command, or MISS"""
+        if not self.is_read(command):
+            return MISS
+        with self._lock:
+            entry = self._entries.get(command)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[command]
+                self.misses += 1
+                return MISS
+            self.hits += 1
+            return dict(entry[1])
+
+    def generation(self, command: str) -> int:
+        """Invalidation generation of a read, to pass to update() later"""
+        with self._lock:
+            return self._generations.get(command, 0)
+
+    def update(self, command: str, response: Optional[Dict],
+               generation: Optional[int] = None):
+        """Store a read's response, or invalidate what a write affects
+
+        With a generation from before the request, a read that raced a
+        write is dropped instead of caching the old value.
+        """
+        if self.is_read(command):
+            if response is not None:
+                self._store(command, response, generation)
+        else:
+            self.invalidate_for(command)
+
+    def _store(self, command: str, response: Dict, generation: Optional[int]):
+        with self._lock:
+            if generation is not None and generation != self._generations.get(command, 0):
+                return
+            self._entries[command] = (time.monotonic() + self.ttls[command], dict(response))
+
+    def invalidate_for(self, command: str):
+        """Drop cached reads made stale by a write command"""
+        name = command.split(':', 1)[0]
+        stale = INVALIDATES.get(name)
+        with self._lock:
+            if stale is None:
+                stale = tuple(self.ttls)
+            for read in stale:
+                # Bumped even when nothing is cached: a read may be in flight
+                self._generations[read] = self._generations.get(read, 0) + 1
+                if self._entries.pop(read, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for read in self.ttls:
+                self._generations[read] = self._generations.get(read, 0) + 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'invalidations': self.invalidations,
+            'size': len(self._entries),
+        }
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Non-blocking interactive speaker controller
+Commands run in the background against one speaker or a whole group, while a
+refresh thread keeps a live status view, so a slow speaker never freezes the
+prompt.
+"""
+
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from discover_speakers import JAMSpeaker
+
+HELP = """
+Available commands:
+  list       - List speakers (* = current target)
+  use X      - Target speaker number, IP, or selector (all, room:.., group:..)
+  status     - Show live status view (refreshed in the background)
+  watch      - Redraw the status view every second until Enter
+  vol XX     - Set volume (0-100)
+  play       - Resume playback
+  pause      - Pause playback
+  next       - Next track
+  prev       - Previous track
+  jobs       - Show commands still running
+  quit       - Exit
+"""
+
+# Prompt command -> (JAMSpeaker method, takes an int argument)
+ACTIONS = {
+    'vol': ('set_volume', True),
+    'play': ('play', False),
+    'pause': ('pause', False),
+    'next': ('next_track', False),
+    'prev': ('prev_track', False),
+}
+
+
+class InteractiveController:
+    """Prompt loop that never waits on the network
+
+    Commands are submitted to a thread pool and report back with their
+    latency when they finish. A refresh thread polls getPlayerStatus for
+    every speaker and keeps the last result and round-trip time.
+    """
+
+    REFRESH_INTERVAL = 5.0
+    MAX_WORKERS = 16
+
+    def __init__(self, devices: List[str], registry=None):
+        self.devices = list(devices)
+        self.registry = registry
+        self.speakers = {ip: JAMSpeaker(ip) for ip in self.devices}
+        self.targets = self.devices[:1]
+        self.view = {}          # ip -> {'status': dict|None, 'latency': float, 'updated': float}
+        self.jobs = {}          # job id -> description
+        self._job_ids = 0
+        self._lock = threading.Lock()
+        self._print_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
+        # Separate pool so slow status polls never queue in front of commands
+        self._refresh_executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
+
+    # Background work
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            try:
+                futures = [self._refresh_executor.submit(self._refresh, ip) for ip in self.devices]
+            except RuntimeError:
+                break   # Shut down while submitting
+            for future in futures:
+                future.result()
+            self._stop.wait(self.REFRESH_INTERVAL)
+
+    def _refresh(self, ip: str):
+        if self._stop.is_set():
+            return
+        start = time.perf_counter()
+        status = self.speakers[ip].get_player_status()
+        latency = time.perf_counter() - start
+        with self._lock:
+            self.view[ip] = {'status': status, 'latency': latency, 'updated': time.time()}
+
+    def submit(self, name: str, arg: Optional[int] = None):
+        """Run a command on every current target in the background"""
+        method, _ = ACTIONS[name]
+        for ip in self.targets:
+            with self._lock:
+                self._job_ids += 1
+                job = self._job_ids
+                self.jobs[job] = f"{name}{' ' + str(arg) if arg is not None else ''} @ {ip}"
+            self._executor.submit(self._run_job, job, ip, method, arg)
+
+    def _run_job(self, job: int, ip: str, method: str, arg: Optional[int]):
+        start = time.perf_counter()
+        call = getattr(self.speakers[ip], method)
+        result = call(arg) if arg is not None else call()
+        latency = (time.perf_counter() - start) * 1000
+        with self._lock:
+            description = self.jobs.pop(job, '')
+        icon = '✅' if result is not None else '❌'
+        self._notify(f"{icon} {description}: {result} ({latency:.0f} ms)")
+
+    def _notify(self, message: str):
+        """Print from a background thread without mangling the prompt"""
+        with self._print_lock:
+            sys.stdout.write(f"\r{message}\nCommand: ")
+            sys.stdout.flush()
+
+    # Prompt commands
+
+    def use(self, target: str) -> bool:
+        """Select the target speaker(s)"""
+        if target.isdigit() and 1 <= int(target) <= len(self.devices):
+            self.targets = [self.devices[int(target) - 1]]
+        elif target in self.speakers:
+            self.targets = [target]
+        elif target == 'all':
+            self.targets = list(self.devices)
+        elif self.registry is not None and ':' in target:
+            ips = [r.ip for r in self.registry.select(target) if r.ip in self.speakers]
+            if not ips:
+                return False
+            self.targets = ips
+        else:
+            return False
+        return True
+
+    def list_devices(self):
+        for idx, ip in enumerate(self.devices, 1):
+            marker = '*' if ip in self.targets else ' '
+            name = ''
+            if self.registry is not None:
+                record = self.registry.by_ip(ip)
+                name = record.name if record and record.name else ''
+            print(f" {marker} {idx:3}  {ip:15} {name}")
+
+    def render(self) -> str:
+        """Status view from the last background refresh"""
+        lines = [f"{'IP':15} {'STATE':7} {'VOL':>3} {'RTT':>7}  AGE"]
+        now = time.time()
+        with self._lock:
+            for ip in self.devices:
+                entry = self.view.get(ip)
+                if entry is None:
+                    lines.append(f"{ip:15} {'...':7}")
+                    continue
+                status = entry['status'] or {}
+                state = status.get('status', 'offline' if entry['status'] is None else '?')
+                lines.append(f"{ip:15} {state:7} {status.get('vol', '-'):>3} "
+                             f"{entry['latency'] * 1000:5.0f}ms  {now - entry['updated']:.0f}s")
+        return '\n'.join(lines)
+
+    def watch(self):
+        """Redraw the status view every second until Enter is pressed"""
+        done = threading.Event()
+
+        def redraw():
+            while not done.wait(1.0):
+                with self._print_lock:
+                    print("\033[2J\033[H" + self.render() + "\n\n(press Enter to stop)")
+
+        thread = threading.Thread(target=redraw, daemon=True)
+        thread.start()
+        try:
+            input()
+        finally:
+            done.set()
+            thread.join()
+
+    def run(self):
+        """Interactive prompt loop"""
+        refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+        refresher.start()
+        print(HELP)
+        try:
+            while True:
+                try:
+                    cmd = input("Command: ").strip().lower()
+                except (KeyboardInterrupt, EOFError):
+                    break
+
+                if not cmd:
+                    continue
+                if cmd == 'quit':
+                    break
+                elif cmd == 'list':
+                    self.list_devices()
+                elif cmd.startswith('use '):
+                    if not self.use(cmd[4:].strip()):
+                        print("Unknown speaker or selector")
+                    else:
+                        print(f"Target: {', '.join(self.targets)}")
+                elif cmd == 'status':
+                    print(self.render())
+                elif cmd == 'watch':
+                    self.watch()
+                elif cmd == 'jobs':
+                    with self._lock:
+                        running = list(self.jobs.values())
+                    print('\n'.join(running) if running else "No commands running")
+                elif cmd.split()[0] in ACTIONS:
+                    name, *args = cmd.split()
+                    takes_arg = ACTIONS[name][1]
+                    try:
+                        arg = int(args[0]) if takes_arg else None
+                    except (IndexError, ValueError):
+                        print(f"Usage: {name} XX")
+                        continue
+                    self.submit(name, arg)
+                else:
+                    print("Unknown command")
+        finally:
+            self.close()
+
+    def close(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+        self._refresh_executor.shutdown(wait=False)
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ['-h', '--help']:
+        print("Usage: python controller.py SPEAKER_IP [SPEAKER_IP ...]")
+        print("       python controller.py --registry speakers.json")
+        sys.exit(0)
+
+    registry = None
+    if sys.argv[1] == '--registry':
+        from registry import SpeakerRegistry
+        registry = SpeakerRegistry.load(sys.argv[2])
+        devices = [record.ip for record in registry if record.ip]
+    else:
+        devices = sys.argv[1:]
+
+    InteractiveController(devices, registry).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,15 @@ JAM WiFi Speaker Discovery and Control Script
 Discovers LinkPlay-based JAM speakers on the network and tests basic API commands.
 """
 
-import socket
-import requests
+import os
+import sys
 import json
 from typing import List, Dict, Optional
 
+from command_cache import MISS, CommandCache
+from tracing import span, tracing_from_args
+from transport import get_transport, pop_option, transport_from_args
+
 class JAMSpeakerDiscovery:
     """Discover and control JAM WiFi speakers using LinkPlay API"""
 
@@ -19,6 +23,14 @@ class JAMSpeakerDiscovery:
     @staticmethod
     def discover_upnp(timeout: int = 5) -> List[str]:
         """Discover speakers using UPnP/SSDP"""
+        return list(JAMSpeakerDiscovery.discover_upnp_locations(timeout))
+
+    @staticmethod
+    def discover_upnp_locations(timeout: int = 5) -> Dict[str, str]:
+        """Discover speakers using UPnP/SSDP, keeping each device description URL
+
+        Returns a dict of IP -> LOCATION header (empty string if not sent).
+        """
         print("🔍 Discovering speakers via UPnP...")
 
         ssdp_request = (
@@ -30,65 +42,72 @@ class JAMSpeakerDiscovery:
             '\r\n'
         )
 
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.settimeout(timeout)
-        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
-
-        devices = []
-        try:
-            sock.sendto(ssdp_request.encode(), (JAMSpeakerDiscovery.UPNP_MULTICAST, JAMSpeakerDiscovery.UPNP_PORT))
-
-            while True:
-                try:
-                    data, addr = sock.recvfrom(4096)
-                    response = data.decode('utf-8', errors='ignore')
+        devices = {}
+        with span('discover_upnp', timeout=timeout) as trace:
+            try:
+                with span('ssdp_wait', timeout=timeout) as phase:
+                    responses = get_transport().ssdp_search(
+                        ssdp_request,
+                        (JAMSpeakerDiscovery.UPNP_MULTICAST, JAMSpeakerDiscovery.UPNP_PORT),
+                        timeout,
+                    )
+                    phase.set(responses=len(responses))
+                for ip, response in responses:
                     if 'MediaRenderer' in response or 'LinkPlay' in response:
-                        ip = addr[0]
                         if ip not in devices:
-                            devices.append(ip)
+                            devices[ip] = JAMSpeakerDiscovery._ssdp_header(response, 'LOCATION') or ''
                             print(f"   Found device at: {ip}")
-                except socket.timeout:
-                    break
-        except Exception as e:
-            print(f"   Error during UPnP discovery: {e}")
-        finally:
-            sock.close()
+                trace.set(outcome=f"{len(devices)} found")
+            except Exception as e:
+                trace.set(outcome=f"error: {e}")
+                print(f"   Error during UPnP discovery: {e}")
 
         return devices
 
+    @staticmethod
+    def _ssdp_header(response: str, name: str) -> Optional[str]:
+        """Return a header value from an SSDP response (case-insensitive)"""
+        for line in response.splitlines()[1:]:
+            key, sep, value = line.partition(':')
+            if sep and key.strip().lower() == name.lower():
+                return value.strip()
+        return None
+
     @staticmethod
     def scan_network(timeout: float = 0.5) -> List[str]:
         """Scan local network for speakers by trying common IP ranges"""
+        with span('scan_network', timeout=timeout) as trace:
+            devices = JAMSpeakerDiscovery._scan_network(timeout)
+            trace.set(outcome=f"{len(devices)} found")
+        return devices
+
+    @staticmethod
+    def _scan_network(timeout: float) -> List[str]:
         print("🔍 Scanning local network for speakers...")
 
-        # Get local IP to determine network range
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        try:
-            s.connect(('8.8.8.8', 80))
-            local_ip = s.getsockname()[0]
-        except:
-            local_ip = '192.168.1.1'
-        finally:
-            s.close()
+        # Get local IP to determine network range (recorded in captures)
+        local_ip = get_transport().local_ip() or '192.168.1.1'
 
         # Get network prefix (e.g., 192.168.1)
         network_prefix = '.'.join(local_ip.split('.')[:-1])
         print(f"   Scanning network: {network_prefix}.0/24")
 
+        transport = get_transport()
         devices = []
         for i in range(1, 255):
             ip = f"{network_prefix}.{i}"
             try:
                 # Try to connect to LinkPlay API port
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(timeout)
-                result = sock.connect_ex((ip, JAMSpeakerDiscovery.LINKPLAY_PORT))
-                sock.close()
+                with span('tcp_connect', ip=ip, port=JAMSpeakerDiscovery.LINKPLAY_PORT) as phase:
+                    result = transport.connect(ip, JAMSpeakerDiscovery.LINKPLAY_PORT, timeout)
+                    phase.set(outcome='open' if result == 0 else f"errno {result}")
 
                 if result == 0:
                     # Port is open, verify it's a LinkPlay device
                     try:
-                        response = requests.get(f"http://{ip}/httpapi.asp?command=getStatusEx", timeout=2)
+                        with span('http_get', ip=ip, command='getStatusEx') as phase:
+                            response = transport.get(f"http://{ip}/httpapi.asp?command=getStatusEx", timeout=2)
+                            phase.set(status=response.status_code)
                         if response.status_code == 200:
                             devices.append(ip)
                             print(f"   Found speaker at: {ip}")
@@ -100,19 +119,45 @@ class JAMSpeakerDiscovery:
         return devices
 
 class JAMSpeaker:
-    """Control a JAM WiFi speaker via LinkPlay API"""
+    """Control a JAM WiFi speaker via LinkPlay API
+
+    Pass cache=CommandCache() to serve repeated reads from memory; writes
+    sent through this object invalidate the reads they affect.
+    """
 
-    def __init__(self, ip: str):
+    def __init__(self, ip: str, transport=None, cache: Optional[CommandCache] = None):
         self.ip = ip
         self.base_url = f"http://{ip}/httpapi.asp"
+        self.transport = transport
+        self.cache = cache
 
     def send_command(self, command: str) -> Optional[Dict]:
         """Send a command to the speaker"""
+        with span('send_command', ip=self.ip, command=command) as trace:
+            if self.cache is not None:
+                cached = self.cache.get(command)
+                if cached is not MISS:
+                    trace.set(outcome='cache hit')
+                    return cached
+                # Taken before the request so a write sent meanwhile wins
+                generation = self.cache.generation(command)
+
+            result = self._request(command)
+            trace.set(outcome='ok' if result is not None else 'failed')
+            if self.cache is not None:
+                self.cache.update(command, result, generation)
+            return result
+
+    def _request(self, command: str) -> Optional[Dict]:
         try:
             url = f"{self.base_url}?command={command}"
-            response = requests.get(url, timeout=5)
+            transport = self.transport or get_transport()
+            with span('http_get', ip=self.ip, command=command) as phase:
+                response = transport.get(url, timeout=5)
+                phase.set(status=response.status_code)
             if response.status_code == 200:
-                return response.json() if response.text else {"raw": response.text}
+                with span('json_parse', ip=self.ip):
+                    return response.json() if response.text else {"raw": response.text}
             return None
         except Exception as e:
             print(f"   Error sending command: {e}")
@@ -153,6 +198,17 @@ class JAMSpeaker:
 
 
 def main():
+    args = tracing_from_args(transport_from_args(sys.argv[1:]))
+
+    # Registry for room:/group: targets; rooms and groups come from a saved file,
+    # which is written back with the discovered names and IPs
+    from registry import SpeakerRegistry
+    registry_path = pop_option(args, '--registry') if '--registry' in args else None
+    if registry_path and os.path.exists(registry_path):
+        registry = SpeakerRegistry.load(registry_path)
+    else:
+        registry = SpeakerRegistry()
+
     print("=" * 60)
     print("JAM WiFi Speaker Discovery & Test")
     print("=" * 60)
@@ -193,6 +249,9 @@ def main():
         else:
             print("   Failed to get status")
 
+        # Name and MAC for the registry (updates saved records if the IP moved)
+        registry.ingest(ip, speaker.get_device_info())
+
         # Get player status
         print("\n🎵 Player Status:")
         player = speaker.get_player_status()
@@ -203,54 +262,17 @@ def main():
 
         print()
 
-    # Interactive control for first speaker
-    if devices:
-        print("=" * 60)
-        print(f"Interactive Control - Speaker: {devices[0]}")
-        print("=" * 60)
-        speaker = JAMSpeaker(devices[0])
-
-        print("\nAvailable commands:")
-        print("  status  - Get current status")
-        print("  vol XX  - Set volume (0-100)")
-        print("  play    - Resume playback")
-        print("  pause   - Pause playback")
-        print("  next    - Next track")
-        print("  prev    - Previous track")
-        print("  quit    - Exit")
-        print()
+    if registry_path:
+        registry.save(registry_path)
+        print(f"💾 Saved {len(registry)} speaker(s) to {registry_path}")
 
-        while True:
-            try:
-                cmd = input("Command: ").strip().lower()
-
-                if cmd == 'quit':
-                    break
-                elif cmd == 'status':
-                    result = speaker.get_status()
-                    print(json.dumps(result, indent=2))
-                elif cmd.startswith('vol '):
-                    vol = int(cmd.split()[1])
-                    result = speaker.set_volume(vol)
-                    print(f"Volume set to {vol}: {result}")
-                elif cmd == 'play':
-                    result = speaker.play()
-                    print(f"Play: {result}")
-                elif cmd == 'pause':
-                    result = speaker.pause()
-                    print(f"Pause: {result}")
-                elif cmd == 'next':
-                    result = speaker.next_track()
-                    print(f"Next: {result}")
-                elif cmd == 'prev':
-                    result = speaker.prev_track()
-                    print(f"Previous: {result}")
-                else:
-                    print("Unknown command")
-            except KeyboardInterrupt:
-                break
-            except Exception as e:
-                print(f"Error: {e}")
+    # Interactive control (any speaker or all of them, without blocking)
+    from controller import InteractiveController
+
+    print("=" * 60)
+    print(f"Interactive Control - {len(devices)} speaker(s), target: {devices[0]}")
+    print("=" * 60)
+    InteractiveController(devices, registry).run()
 
 if __name__ == "__main__":
     main()
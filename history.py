@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+SQLite inventory and status history for JAM WiFi speakers
+Records discovery results (with IP changes) and periodic status snapshots
+per MAC. Writes are buffered and committed in batches, and a retention
+policy folds old snapshots into hourly rows so the file stays small.
+"""
+
+import json
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from command_cache import CommandCache
+from discover_speakers import JAMSpeaker
+from registry import normalize_mac
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS speakers (
+    mac TEXT PRIMARY KEY,
+    ip TEXT,
+    name TEXT,
+    model TEXT,
+    firmware TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ip_changes (
+    mac TEXT NOT NULL,
+    ts REAL NOT NULL,
+    old_ip TEXT,
+    new_ip TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ip_changes_mac_ts ON ip_changes (mac, ts);
+CREATE TABLE IF NOT EXISTS snapshots (
+    mac TEXT NOT NULL,
+    ts REAL NOT NULL,
+    online INTEGER NOT NULL,
+    state TEXT,
+    vol INTEGER,
+    status TEXT
+);
+CREATE INDEX IF NOT EXISTS snapshots_mac_ts ON snapshots (mac, ts);
+CREATE INDEX IF NOT EXISTS snapshots_ts ON snapshots (ts);
+CREATE TABLE IF NOT EXISTS snapshots_hourly (
+    mac TEXT NOT NULL,
+    hour INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    online_samples INTEGER NOT NULL,
+    vol_sum INTEGER NOT NULL,
+    vol_samples INTEGER NOT NULL,
+    drops INTEGER NOT NULL,
+    PRIMARY KEY (mac, hour)
+);
+"""
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+class HistoryStore:
+    """Embedded SQLite store with batched writes
+
+    record_sighting() and record_snapshot() only append to an in-memory
+    buffer; the buffer is written in one transaction when it reaches
+    batch_size rows or flush_interval seconds, on flush() and on close().
+    """
+
+    def __init__(self, path: str, batch_size: int = 500, flush_interval: float = 5.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._sightings = []
+        self._snapshots = []
+        self._last_flush = time.monotonic()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # auto_vacuum only takes effect before the first table is created
+        self._db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._db.close()
+
+    # Buffered writes
+
+    def record_sighting(self, ip: str, status: Dict, ts: Optional[float] = None):
+        """Record a discovery result (getStatus data with MAC)"""
+        if not status or not status.get('MAC'):
+            return
+        row = (normalize_mac(status['MAC']), ts or time.time(), ip,
+               status.get('DeviceName'), status.get('hardware'), status.get('firmware'))
+        with self._lock:
+            self._sightings.append(row)
+        self._maybe_flush()
+
+    def record_snapshot(self, mac: str, status: Optional[Dict], ts: Optional[float] = None):
+        """Record a status poll; status None means the speaker did not answer"""
+        vol = None
+        if status and str(status.get('vol', '')).isdigit():
+            vol = int(status['vol'])
+        row = (normalize_mac(mac), ts or time.time(), 1 if status else 0,
+               status.get('status') if status else None, vol,
+               json.dumps(status, separators=(',', ':')) if status else None)
+        with self._lock:
+            self._snapshots.append(row)
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        pending = len(self._sightings) + len(self._snapshots)
+        if pending >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered in a single transaction"""
+        with self._lock:
+            sightings, self._sightings = self._sightings, []
+            snapshots, self._snapshots = self._snapshots, []
+            self._last_flush = time.monotonic()
+            if not sightings and not snapshots:
+                return
+            with self._db:
+                for row in sightings:
+                    self._apply_sighting(*row)
+                if snapshots:
+                    self._db.executemany(
+                        "INSERT INTO snapshots (mac, ts, online, state, vol, status) "
+                        "VALUES (?, ?, ?, ?, ?, ?)", snapshots)
+
+    def _apply_sighting(self, mac, ts, ip, name, model, firmware):
+        row = self._db.execute("SELECT ip FROM speakers WHERE mac = ?", (mac,)).fetchone()
+        if row is None:
+            self._db.execute(
+                "INSERT INTO speakers (mac, ip, name, model, firmware, first_seen, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", (mac, ip, name, model, firmware, ts, ts))
+            self._db.execute("INSERT INTO ip_changes (mac, ts, old_ip, new_ip) VALUES (?, ?, NULL, ?)",
+                             (mac, ts, ip))
+            return
+        if row[0] != ip:
+            self._db.execute("INSERT INTO ip_changes (mac, ts, old_ip, new_ip) VALUES (?, ?, ?, ?)",
+                             (mac, ts, row[0], ip))
+        self._db.execute(
+            "UPDATE speakers SET ip = ?, name = COALESCE(?, name), model = COALESCE(?, model), "
+            "firmware = COALESCE(?, firmware), last_seen = MAX(last_seen, ?) WHERE mac = ?",
+            (ip, name, model, firmware, ts, mac))
+
+    # Queries
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        self.flush()
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def speakers(self) -> List[Tuple]:
+        """(mac, ip, name, last_seen) for every known speaker"""
+        return self._query("SELECT mac, ip, name, last_seen FROM speakers ORDER BY name, mac")
+
+    def mac_for_ip(self, ip: str) -> Optional[str]:
+        rows = self._query("SELECT mac FROM speakers WHERE ip = ? ORDER BY last_seen DESC LIMIT 1", (ip,))
+        return rows[0][0] if rows else None
+
+    def ip_history(self, mac: str) -> List[Tuple]:
+        """(ts, old_ip, new_ip) for each IP change of a speaker"""
+        return self._query("SELECT ts, old_ip, new_ip FROM ip_changes WHERE mac = ? ORDER BY ts",
+                           (normalize_mac(mac),))
+
+    def snapshots(self, mac: str, start: float, end: float) -> List[Tuple]:
+        """Raw (ts, online, state, vol) snapshots in [start, end)"""
+        return self._query("SELECT ts, online, state, vol FROM snapshots "
+                           "WHERE mac = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                           (normalize_mac(mac), start, end))
+
+    def availability(self, mac: str, start: float, end: float) -> Dict[str, float]:
+        """Samples, online fraction and offline drops in [start, end), raw + hourly"""
+        mac = normalize_mac(mac)
+        rows = self.snapshots(mac, start, end)
+        samples = len(rows)
+        online = sum(row[1] for row in rows)
+        drops = sum(1 for prev, cur in zip(rows, rows[1:]) if prev[1] and not cur[1])
+
+        hourly = self._query("SELECT COALESCE(SUM(samples), 0), COALESCE(SUM(online_samples), 0), "
+                             "COALESCE(SUM(drops), 0) "
+                             "FROM snapshots_hourly WHERE mac = ? AND hour >= ? AND hour < ?",
+                             (mac, int(start // HOUR), int(end // HOUR) + 1))[0]
+        samples += hourly[0]
+        online += hourly[1]
+        drops += hourly[2]
+        return {
+            'samples': samples,
+            'online_fraction': online / samples if samples else 0.0,
+            'offline_drops': drops,
+        }
+
+    # Retention
+
+    def apply_retention(self, raw_days: float = 7, hourly_days: float = 365,
+                        ip_change_days: float = 3650, now: Optional[float] = None):
+        """Fold raw snapshots older than raw_days into hourly rows and drop old data
+
+        The raw cutoff is aligned to an hour so every hour is folded exactly once.
+        A drop (online sample followed by an offline one) is counted in the hour
+        of the online sample, so drops spanning the cutoff are kept too.
+        """
+        now = now or time.time()
+        raw_cutoff = int((now - raw_days * DAY) // HOUR) * HOUR
+        self.flush()
+        with self._lock:
+            with self._db:
+                # LEAD runs over the raw rows that are kept as well, so the
+                # last folded sample still sees the sample after it
+                rows = self._db.execute(
+                    "SELECT mac, CAST(ts / ? AS INTEGER), COUNT(*), SUM(online), "
+                    "COALESCE(SUM(vol), 0), COUNT(vol), SUM(online = 1 AND next_online = 0) "
+                    "FROM (SELECT mac, ts, online, vol, LEAD(online) OVER "
+                    "(PARTITION BY mac ORDER BY ts) AS next_online FROM snapshots) "
+                    "WHERE ts < ? GROUP BY mac, CAST(ts / ? AS INTEGER)",
+                    (HOUR, raw_cutoff, HOUR)).fetchall()
+                for mac, hour, samples, online, vol_sum, vol_samples, drops in rows:
+                    self._db.execute(
+                        "INSERT OR IGNORE INTO snapshots_hourly VALUES (?, ?, 0, 0, 0, 0, 0)",
+                        (mac, hour))
+                    self._db.execute(
+                        "UPDATE snapshots_hourly SET samples = samples + ?, "
+                        "online_samples = online_samples + ?, vol_sum = vol_sum + ?, "
+                        "vol_samples = vol_samples + ?, drops = drops + ? "
+                        "WHERE mac = ? AND hour = ?",
+                        (samples, online, vol_sum, vol_samples, drops, mac, hour))
+                self._db.execute("DELETE FROM snapshots WHERE ts < ?", (raw_cutoff,))
+                self._db.execute("DELETE FROM snapshots_hourly WHERE hour < ?",
+                                 (int((now - hourly_days * DAY) // HOUR),))
+                self._db.execute("DELETE FROM ip_changes WHERE ts < ?", (now - ip_change_days * DAY,))
+            # executescript steps the pragma to completion (execute frees one page)
+            self._db.executescript("PRAGMA incremental_vacuum;")
+        return len(rows)
+
+
+def poll(store: HistoryStore, ips: List[str], interval: float,
+         retention_interval: float = HOUR):
+    """Snapshot every speaker's player status until Ctrl+C
+
+    The retention policy is applied every retention_interval seconds (and
+    at start), so a long-running poll keeps the file bounded.
+    """
+    speakers = {ip: JAMSpeaker(ip, cache=CommandCache()) for ip in ips}
+    next_retention = time.monotonic()
+    while True:
+        if time.monotonic() >= next_retention:
+            folded = store.apply_retention()
+            if folded:
+                print(f"🧹 Folded {folded} hour(s) of snapshots")
+            next_retention = time.monotonic() + retention_interval
+        for ip, speaker in speakers.items():
+            ts = time.time()
+            hits = speaker.cache.hits
+            info = speaker.get_device_info()    # Cached; only used for the MAC
+            # A cached answer says nothing about the speaker being there now
+            if info and speaker.cache.hits == hits:
+                store.record_sighting(ip, info, ts)
+            mac = info.get('MAC') if info else store.mac_for_ip(ip)
+            if mac:
+                store.record_snapshot(mac, speaker.get_player_status(), ts)
+        time.sleep(interval)
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] in ['-h', '--help']:
+        print("JAM WiFi Speaker History")
+        print("=" * 60)
+        print()
+        print("Usage:")
+        print("  python history.py DB scan [NETWORK]         # Record discovered speakers")
+        print("  python history.py DB poll IP [IP ...]        # Snapshot status every 30s (prunes hourly)")
+        print("  python history.py DB list                   # Known speakers")
+        print("  python history.py DB ips MAC                # IP change history")
+        print("  python history.py DB uptime MAC [DAYS]      # Availability")
+        print("  python history.py DB prune                  # Apply retention policy")
+        sys.exit(0)
+
+    with HistoryStore(sys.argv[1]) as store:
+        command, args = sys.argv[2], sys.argv[3:]
+
+        if command == 'scan':
+            import scan_network
+            network = args[0] if args else scan_network.get_local_network()
+            if not network:
+                print("❌ Could not auto-detect network")
+                print("Please specify network manually:")
+                print(f"  python history.py {sys.argv[1]} scan 192.168.1")
+                sys.exit(1)
+            for ip, data in scan_network.scan_network(network):
+                store.record_sighting(ip, data)
+        elif command == 'poll':
+            print(f"📈 Polling {len(args)} speaker(s) every 30s (Ctrl+C to stop)")
+            try:
+                poll(store, args, 30)
+            except KeyboardInterrupt:
+                print()
+        elif command == 'list':
+            for mac, ip, name, last_seen in store.speakers():
+                seen = time.strftime('%Y-%m-%d %H:%M', time.localtime(last_seen))
+                print(f"  {name or '(unnamed)':20} {ip or '?':15} {mac}  last seen {seen}")
+        elif command == 'ips':
+            for ts, old_ip, new_ip in store.ip_history(args[0]):
+                when = time.strftime('%Y-%m-%d %H:%M', time.localtime(ts))
+                print(f"  {when}  {old_ip or '(first seen)'} -> {new_ip}")
+        elif command == 'uptime':
+            days = float(args[1]) if len(args) > 1 else 7
+            now = time.time()
+            stats = store.availability(args[0], now - days * DAY, now)
+            print(f"  Last {days:g} day(s): {stats['online_fraction']:.1%} online, "
+                  f"{stats['offline_drops']} drop(s), {stats['samples']} sample(s)")
+        elif command == 'prune':
+            folded = store.apply_retention()
+            print(f"✅ Folded {folded} hour(s) of snapshots")
+        else:
+            print(f"Unknown command: {command}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
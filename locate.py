@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Find a speaker's new IP by its MAC address
+Used after WiFi provisioning, when the speaker leaves 10.10.10.254 and gets
+an unknown DHCP address. Instead of sweeping the subnet, it watches SSDP
+responses and the OS neighbor (ARP) table and only probes those candidates.
+"""
+
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Set, Union
+
+from discover_speakers import JAMSpeakerDiscovery
+from registry import normalize_mac
+from transport import get_transport
+
+# getStatus fields that may carry the station MAC
+MAC_FIELDS = ('MAC', 'STA_MAC', 'ETH_MAC')
+
+ARP_LINE = re.compile(r'(\d+\.\d+\.\d+\.\d+)\D.*?((?:[0-9a-fA-F]{1,2}[:-]){5}[0-9a-fA-F]{1,2})')
+
+
+def neighbor_table() -> Dict[str, str]:
+    """Read the OS neighbor table as {mac: ip} (Linux /proc, else `arp -an`)"""
+    table = {}
+    try:
+        with open('/proc/net/arp') as f:
+            lines = f.read().splitlines()[1:]
+    except OSError:
+        try:
+            result = subprocess.run(['arp', '-an'], capture_output=True, text=True, timeout=5)
+            lines = result.stdout.splitlines()
+        except (OSError, subprocess.SubprocessError):
+            return table
+
+    for line in lines:
+        match = ARP_LINE.search(line)
+        if not match:
+            continue
+        try:
+            mac = normalize_mac(match.group(2))
+        except ValueError:
+            continue
+        if mac != '00:00:00:00:00:00':     # Incomplete entry
+            table[mac] = match.group(1)
+    return table
+
+
+def ssdp_candidates(timeout: float = 2) -> Iterable[str]:
+    """IPs of media renderers answering an M-SEARCH"""
+    request = (
+        'M-SEARCH * HTTP/1.1\r\n'
+        'HOST: 239.255.255.250:1900\r\n'
+        'MAN: "ssdp:discover"\r\n'
+        'MX: 1\r\n'
+        'ST: urn:schemas-upnp-org:device:MediaRenderer:1\r\n'
+        '\r\n'
+    )
+    try:
+        responses = get_transport().ssdp_search(
+            request, (JAMSpeakerDiscovery.UPNP_MULTICAST, JAMSpeakerDiscovery.UPNP_PORT), timeout)
+    except OSError:
+        return []
+    return [ip for ip, _ in responses]
+
+
+def status_macs(status: Dict) -> Set[str]:
+    """Every valid MAC a getStatus response reports (see MAC_FIELDS)"""
+    macs = set()
+    for field in MAC_FIELDS:
+        try:
+            macs.add(normalize_mac(status[field]))
+        except (KeyError, TypeError, AttributeError, ValueError):
+            continue
+    return macs
+
+
+def probe_macs(ip: str, timeout: float = 2) -> Optional[Set[str]]:
+    """Ask a candidate for getStatus and return the MACs it reports
+
+    None means no LinkPlay answer (yet); an empty set means it answered
+    without a usable MAC.
+    """
+    try:
+        response = get_transport().get(f"http://{ip}/httpapi.asp?command=getStatus", timeout=timeout)
+        if response.status_code != 200:
+            return None
+        data = response.json()
+    except Exception:
+        return None
+    if not isinstance(data, dict):
+        return set()
+    return status_macs(data)
+
+
+def locate_by_mac(mac: Union[str, Iterable[str]], timeout: float = 90,
+                  hints: Iterable[str] = (), interval: float = 1.0,
+                  verbose: bool = True) -> Optional[str]:
+    """Find the IP of the speaker with this MAC, verified with getStatus
+
+    `mac` may also be several MACs of one speaker (e.g. status_macs() of its
+    pre-handover status), since the station interface can differ from 'MAC'.
+    Each round reads the neighbor table (exact MAC hits are probed first),
+    runs a short SSDP search and probes new candidates in parallel. IPs that
+    answered with other MACs are not probed again. `hints` (e.g. the last
+    known IP) are probed in the first round.
+    """
+    wanted = {normalize_mac(m) for m in ([mac] if isinstance(mac, str) else mac)}
+    if not wanted:
+        raise ValueError("No MAC address to look for")
+    deadline = time.monotonic() + timeout
+    others = set()      # IPs proven to be other devices
+    candidates = list(hints)
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        while time.monotonic() < deadline:
+            table = neighbor_table()
+            direct = [table[m] for m in sorted(wanted) if m in table]
+            candidates[:0] = direct
+            candidates.extend(ssdp_candidates(min(2.0, max(0.5, deadline - time.monotonic()))))
+
+            todo = list(dict.fromkeys(ip for ip in candidates if ip not in others))
+            candidates = []
+            if todo:
+                if verbose:
+                    print(f"   Probing {len(todo)} candidate(s)...")
+                for ip, macs in zip(todo, executor.map(probe_macs, todo)):
+                    if macs and macs & wanted:
+                        return ip
+                    # Only rule out IPs that answered; silent ones may still be joining
+                    if macs is not None:
+                        others.add(ip)
+
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                time.sleep(min(interval, remaining))
+    return None
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ['-h', '--help']:
+        print("Usage: python locate.py MAC [MAC ...] [TIMEOUT_SECONDS]")
+        print("Example: python locate.py 00:22:6C:12:34:56 60")
+        sys.exit(0)
+
+    args = sys.argv[1:]
+    timeout = 90
+    if len(args) > 1:
+        try:
+            normalize_mac(args[-1])
+        except ValueError:
+            timeout = float(args.pop())
+    macs = sorted({normalize_mac(mac) for mac in args})
+    print(f"🔍 Looking for speaker {', '.join(macs)} (up to {timeout:.0f}s)...")
+    start = time.monotonic()
+    ip = locate_by_mac(macs, timeout)
+    if ip:
+        print(f"✅ Found at {ip} after {time.monotonic() - start:.1f}s")
+    else:
+        print("❌ Not found. Is this computer on the same network as the speaker?")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
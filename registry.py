@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+In-memory speaker registry for large installations
+Keeps one compact record per speaker (keyed by MAC) with hash indexes on
+MAC, IP, name, room and group, so lookups and selections like
+"all speakers in zone B" never scan the whole list.
+"""
+
+import json
+import sys
+from typing import Dict, Iterable, List, Optional, Set
+
+from discover_speakers import JAMSpeaker
+
+
+def normalize_mac(mac: str) -> str:
+    """aa:bb:cc:dd:ee:ff form, whatever separators/case the device used"""
+    mac = mac.strip().lower()
+    parts = mac.replace('-', ':').split(':')
+    if len(parts) == 6:
+        # macOS arp prints octets without leading zeros (a:b:c:d:e:f)
+        mac = ''.join(part.zfill(2) for part in parts)
+    digits = ''.join(c for c in mac if c in '0123456789abcdef')
+    if len(digits) != 12:
+        raise ValueError(f"Invalid MAC address: {mac}")
+    return ':'.join(digits[i:i + 2] for i in range(0, 12, 2))
+
+
+class SpeakerRecord:
+    """What we know about one speaker"""
+
+    __slots__ = ('mac', 'ip', 'name', 'room', 'groups', 'model', 'firmware')
+
+    def __init__(self, mac: str, ip: Optional[str] = None, name: Optional[str] = None,
+                 room: Optional[str] = None, groups: Iterable[str] = (),
+                 model: Optional[str] = None, firmware: Optional[str] = None):
+        self.mac = mac
+        self.ip = ip
+        self.name = name
+        self.room = room
+        self.groups = frozenset(groups)
+        self.model = model
+        self.firmware = firmware
+
+    def to_dict(self) -> Dict:
+        data = {key: getattr(self, key) for key in self.__slots__}
+        data['groups'] = sorted(self.groups)
+        return data
+
+    def __repr__(self):
+        return f"SpeakerRecord({self.mac}, ip={self.ip}, name={self.name!r}, room={self.room!r})"
+
+
+class SpeakerRegistry:
+    """Speaker records with hash indexes on every lookup key
+
+    MAC is the identity and IP a unique index that is updated in place when
+    rediscovery reports a change. Name, room and group are multi-valued
+    indexes (key -> set of MACs), since several speakers can share a name
+    (two factory-default "JAM Symphony" units, say). Names, rooms and groups
+    match case-insensitively.
+    """
+
+    def __init__(self):
+        self._by_mac = {}       # mac -> SpeakerRecord
+        self._by_ip = {}        # ip -> mac
+        self._by_name = {}      # name -> {mac}
+        self._by_room = {}      # room -> {mac}
+        self._by_group = {}     # group -> {mac}
+
+    def __len__(self):
+        return len(self._by_mac)
+
+    def __iter__(self):
+        return iter(self._by_mac.values())
+
+    def __contains__(self, mac: str) -> bool:
+        return normalize_mac(mac) in self._by_mac
+
+    # Updates
+
+    def add(self, mac: str, ip: Optional[str] = None, name: Optional[str] = None,
+            **fields) -> SpeakerRecord:
+        """Add a speaker or update an existing one, keeping indexes in sync"""
+        mac = normalize_mac(mac)
+        record = self._by_mac.get(mac)
+        if record is None:
+            record = self._by_mac[mac] = SpeakerRecord(mac)
+        if ip is not None:
+            self._set_ip(record, ip)
+        if name is not None:
+            self._set_name(record, name)
+        if 'room' in fields:
+            self._set_room(record, fields.pop('room'))
+        if 'groups' in fields:
+            self._set_groups(record, fields.pop('groups'))
+        for key, value in fields.items():
+            if key not in ('model', 'firmware'):
+                raise TypeError(f"Unknown speaker field: {key}")
+            setattr(record, key, value)
+        return record
+
+    def ingest(self, ip: str, status: Dict) -> Optional[SpeakerRecord]:
+        """Add/update from a getStatus response (as returned by the scanners)"""
+        if not status or not status.get('MAC'):
+            return None
+        return self.add(status['MAC'], ip=ip, name=status.get('DeviceName'),
+                        model=status.get('hardware'), firmware=status.get('firmware'))
+
+    def tag(self, mac: str, room: Optional[str] = None, groups: Optional[Iterable[str]] = None):
+        """Assign room and/or groups to a speaker"""
+        fields = {}
+        if room is not None:
+            fields['room'] = room
+        if groups is not None:
+            fields['groups'] = groups
+        return self.add(mac, **fields)
+
+    def remove(self, mac: str) -> bool:
+        record = self._by_mac.pop(normalize_mac(mac), None)
+        if record is None:
+            return False
+        self._by_ip.pop(record.ip, None)
+        _discard(self._by_name, _key(record.name), record.mac)
+        _discard(self._by_room, _key(record.room), record.mac)
+        for group in record.groups:
+            _discard(self._by_group, _key(group), record.mac)
+        return True
+
+    def _set_ip(self, record: SpeakerRecord, ip: str):
+        if record.ip == ip:
+            return
+        # DHCP may have handed this IP to another speaker; that one's IP is now unknown
+        previous = self._by_ip.get(ip)
+        if previous and previous != record.mac:
+            self._by_mac[previous].ip = None
+        self._by_ip.pop(record.ip, None)
+        self._by_ip[ip] = record.mac
+        record.ip = ip
+
+    def _set_name(self, record: SpeakerRecord, name: str):
+        if record.name == name:
+            return
+        _discard(self._by_name, _key(record.name), record.mac)
+        self._by_name.setdefault(_key(name), set()).add(record.mac)
+        record.name = name
+
+    def _set_room(self, record: SpeakerRecord, room: Optional[str]):
+        _discard(self._by_room, _key(record.room), record.mac)
+        if room:
+            self._by_room.setdefault(_key(room), set()).add(record.mac)
+        record.room = room or None
+
+    def _set_groups(self, record: SpeakerRecord, groups: Iterable[str]):
+        groups = frozenset(groups)
+        # Compare index keys, not raw strings: 'Zone-B' and 'zone-b' are one group
+        old = {_key(group) for group in record.groups}
+        new = {_key(group) for group in groups}
+        for key in old - new:
+            _discard(self._by_group, key, record.mac)
+        for key in new - old:
+            self._by_group.setdefault(key, set()).add(record.mac)
+        record.groups = groups
+
+    # Lookups
+
+    def by_mac(self, mac: str) -> Optional[SpeakerRecord]:
+        return self._by_mac.get(normalize_mac(mac))
+
+    def by_ip(self, ip: str) -> Optional[SpeakerRecord]:
+        return self._record(self._by_ip.get(ip))
+
+    def by_name(self, name: str) -> List[SpeakerRecord]:
+        return self._records(self._by_name.get(_key(name), ()))
+
+    def in_room(self, room: str) -> List[SpeakerRecord]:
+        return self._records(self._by_room.get(_key(room), ()))
+
+    def in_group(self, group: str) -> List[SpeakerRecord]:
+        return self._records(self._by_group.get(_key(group), ()))
+
+    def _record(self, mac: Optional[str]) -> Optional[SpeakerRecord]:
+        return self._by_mac.get(mac) if mac else None
+
+    def _records(self, macs: Iterable[str]) -> List[SpeakerRecord]:
+        return [self._by_mac[mac] for mac in sorted(macs)]
+
+    def select(self, selector: str) -> List[SpeakerRecord]:
+        """Resolve a selector to speakers
+
+        Selectors are 'all', 'mac:..', 'ip:..', 'name:..', 'room:..' or
+        'group:..'; several can be joined with ',' (union).
+        """
+        macs = set()
+        for part in selector.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            if part == 'all':
+                macs.update(self._by_mac)
+                continue
+            kind, sep, value = part.partition(':')
+            if not sep:
+                raise ValueError(f"Invalid selector: {part}")
+            value = value.strip()
+            if kind == 'name':
+                macs.update(self._by_name.get(_key(value), ()))
+            elif kind == 'room':
+                macs.update(self._by_room.get(_key(value), ()))
+            elif kind == 'group':
+                macs.update(self._by_group.get(_key(value), ()))
+            elif kind in ('mac', 'ip'):
+                record = getattr(self, f"by_{kind}")(value)
+                if record:
+                    macs.add(record.mac)
+            else:
+                raise ValueError(f"Unknown selector type: {kind}")
+        return self._records(macs)
+
+    def speakers(self, selector: str) -> List[JAMSpeaker]:
+        """JAMSpeaker controllers for every selected speaker with a known IP"""
+        return [JAMSpeaker(record.ip) for record in self.select(selector) if record.ip]
+
+    # Persistence (rooms and groups cannot be discovered, so keep them on disk)
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            json.dump([record.to_dict() for record in self], f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> 'SpeakerRegistry':
+        registry = cls()
+        with open(path) as f:
+            for data in json.load(f):
+                registry.add(**data)
+        return registry
+
+
+def _key(value: Optional[str]) -> Optional[str]:
+    return value.casefold() if value else None
+
+
+def _discard(index: Dict[str, Set[str]], key: Optional[str], mac: str):
+    macs = index.get(key)
+    if macs is not None:
+        macs.discard(mac)
+        if not macs:
+            del index[key]
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] in ['-h', '--help']:
+        print("JAM WiFi Speaker Registry")
+        print("=" * 60)
+        print()
+        print("Usage:")
+        print("  python registry.py speakers.json SELECTOR")
+        print()
+        print("Examples:")
+        print("  python registry.py speakers.json all")
+        print("  python registry.py speakers.json 'group:zone-b'")
+        print("  python registry.py speakers.json 'room:kitchen,name:Patio'")
+        sys.exit(0)
+
+    registry = SpeakerRegistry.load(sys.argv[1])
+    selected = registry.select(sys.argv[2])
+    print(f"✅ {len(selected)} of {len(registry)} speaker(s) selected\n")
+    for record in selected:
+        print(f"  {record.name or '(unnamed)':20} {record.ip or '?':15} {record.mac}"
+              f"  room={record.room or '-'} groups={','.join(sorted(record.groups)) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,42 +4,48 @@ Universal network scanner for JAM WiFi speakers
 Scans any network range you specify
 """
 
-import requests
-import socket
 import json
 import sys
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from tracing import span, tracing_from_args
+from transport import get_transport, transport_from_args
+
 def check_speaker(ip):
     """Check if an IP is a LinkPlay speaker"""
-    try:
-        # Check if port 8080 is open
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(0.5)
-        result = sock.connect_ex((ip, 8080))
-        sock.close()
-
-        if result == 0:
-            # Port is open, try LinkPlay API
-            try:
-                response = requests.get(f"http://{ip}/httpapi.asp?command=getStatus", timeout=2)
-                if response.status_code == 200:
-                    data = response.json()
-                    return (ip, True, data)
-            except:
-                pass
-
-        return (ip, False, None)
-    except Exception as e:
-        return (ip, False, None)
+    transport = get_transport()
+    with span('check_speaker', ip=ip) as trace:
+        try:
+            # Check if port 8080 is open
+            with span('tcp_connect', ip=ip, port=8080) as phase:
+                result = transport.connect(ip, 8080, 0.5)
+                phase.set(outcome='open' if result == 0 else f"errno {result}")
+
+            if result == 0:
+                # Port is open, try LinkPlay API
+                try:
+                    with span('http_get', ip=ip, command='getStatus') as phase:
+                        response = transport.get(f"http://{ip}/httpapi.asp?command=getStatus", timeout=2)
+                        phase.set(status=response.status_code)
+                    if response.status_code == 200:
+                        with span('json_parse', ip=ip):
+                            data = response.json()
+                        trace.set(outcome='speaker')
+                        return (ip, True, data)
+                except:
+                    pass
+
+            trace.set(outcome='no speaker')
+            return (ip, False, None)
+        except Exception as e:
+            trace.set(outcome=f"error: {e}")
+            return (ip, False, None)
 
 def get_local_network():
     """Detect local network range"""
     try:
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        s.connect(('8.8.8.8', 80))
-        local_ip = s.getsockname()[0]
-        s.close()
+        # From the transport, so a replayed capture scans the recorded network
+        local_ip = get_transport().local_ip()
 
         # Get network prefix (e.g., 192.168.1)
         network_prefix = '.'.join(local_ip.split('.')[:-1])
@@ -49,6 +55,10 @@ def get_local_network():
 
 def scan_network(network_prefix):
     """Scan a network for JAM speakers"""
+    with span('scan_network', network=f"{network_prefix}.0/24"):
+        return _scan_network(network_prefix)
+
+def _scan_network(network_prefix):
     print(f"🔍 Scanning {network_prefix}.0/24 for JAM WiFi speakers...")
     print("=" * 60)
     print("This will scan 254 IPs, please wait...\n")
@@ -104,10 +114,14 @@ def scan_network(network_prefix):
         print("  - Speakers are connected to your WiFi network")
         print("  - You can reach this network from this computer")
 
+    return speakers_found
+
 def main():
-    if len(sys.argv) > 1:
+    args = tracing_from_args(transport_from_args(sys.argv[1:]))
+
+    if args:
         # User specified network
-        if sys.argv[1] in ['-h', '--help']:
+        if args[0] in ['-h', '--help']:
             print("JAM WiFi Speaker Network Scanner")
             print("=" * 60)
             print()
@@ -120,9 +134,16 @@ def main():
             print("  python scan_network.py")
             print("  python scan_network.py 192.168.0")
             print("  python scan_network.py 10.5.0")
+            print()
+            print("Record / replay traffic (for offline performance testing):")
+            print("  python scan_network.py --record scan.jsonl.gz")
+            print("  python scan_network.py --replay scan.jsonl.gz [--fast]")
+            print()
+            print("Trace scan phases (Chrome trace-event JSON):")
+            print("  python scan_network.py --trace scan_trace.json")
             sys.exit(0)
 
-        network_prefix = sys.argv[1]
+        network_prefix = args[0]
     else:
         # Auto-detect
         network_prefix = get_local_network()
@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+In-process scheduler for timed speaker actions
+Holds scheduled and recurring commands (volume ramps, store-open playback,
+quiet hours...) for many speakers in a hashed timer wheel, so one process
+replaces a pile of cron jobs that each rediscover the speakers.
+"""
+
+import functools
+import itertools
+import math
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from discover_speakers import JAMSpeaker
+
+# What to do with a fire that was missed (process asleep, clock jumped forward)
+MISFIRE_COALESCE = 'coalesce'   # Fire once, late
+MISFIRE_SKIP = 'skip'           # Drop it, wait for the next occurrence
+
+Sender = Callable[[str, str], Optional[Dict]]
+
+
+class ScheduledAction:
+    """One scheduled (optionally recurring) speaker command"""
+
+    __slots__ = ('id', 'ip', 'command', 'when', 'every', 'daily', 'misfire', 'due_tick',
+                 'cancelled')
+
+    def __init__(self, id: int, ip: str, command: str, when: float,
+                 every: Optional[float], misfire: str,
+                 daily: Optional[Tuple[int, int]] = None):
+        self.id = id
+        self.ip = ip
+        self.command = command
+        self.when = when            # Wall clock time (epoch seconds)
+        self.every = every          # Repeat interval in seconds, None for one-shot
+        self.daily = daily          # (hour, minute) local time, recomputed each day
+        self.misfire = misfire
+        self.due_tick = 0
+        self.cancelled = False
+
+
+class TimerWheel:
+    """Hashed timer wheel: O(1) insert, O(slot) work per tick
+
+    Each action lives in slot (due_tick % slots). Actions more than one
+    revolution away simply stay in their slot until their tick comes round.
+    """
+
+    def __init__(self, tick: float = 0.1, slots: int = 4096):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.current = None     # Last tick processed
+        self.count = 0
+
+    def tick_for(self, when: float) -> int:
+        return int(when // self.tick)
+
+    def add(self, action: ScheduledAction):
+        # Round up so the tick that releases an action never starts before it is due
+        due = int(math.ceil(action.when / self.tick))
+        if self.current is not None and due <= self.current:
+            due = self.current + 1
+        action.due_tick = due
+        self.slots[due % len(self.slots)].append(action)
+        self.count += 1
+
+    def advance(self, to_tick: int) -> List[ScheduledAction]:
+        """Move to to_tick and return every action due up to and including it"""
+        if self.current is not None and to_tick <= self.current:
+            return []
+
+        # First run or a long gap (sleep, clock jump) visits each slot once
+        # instead of every tick
+        if self.current is None or to_tick - self.current >= len(self.slots):
+            indexes = range(len(self.slots))
+        else:
+            indexes = (t % len(self.slots) for t in range(self.current + 1, to_tick + 1))
+
+        due = []
+        for index in indexes:
+            slot = self.slots[index]
+            if not slot:
+                continue
+            keep = []
+            for action in slot:
+                if action.cancelled:
+                    self.count -= 1
+                elif action.due_tick <= to_tick:
+                    due.append(action)
+                    self.count -= 1
+                else:
+                    keep.append(action)
+            self.slots[index] = keep
+        self.current = to_tick
+        return due
+
+    def rewind(self, to_tick: int):
+        """Wall clock went backwards: keep pending actions, restart from to_tick"""
+        self.current = to_tick
+
+
+class SpeakerScheduler:
+    """Runs scheduled speaker commands from a background thread
+
+    Actions due in the same tick are dispatched together as one batch, with
+    duplicate (ip, command) pairs sent once. Missed fires are detected by
+    comparing how far the wall clock moved against the monotonic clock and
+    handled according to each action's misfire policy.
+
+    Lateness is measured when the sender starts, so time queued in the
+    executor counts. Coalesced misfires go to missed_lateness instead, to
+    keep their (possibly hours long) delay out of the on-time figures. A
+    send counts as sent only if the sender returned a response.
+    """
+
+    GRACE = 1.0         # Seconds late before a fire counts as missed
+    MAX_WORKERS = 50
+
+    def __init__(self, sender: Optional[Sender] = None, tick: float = 0.1,
+                 slots: int = 4096):
+        self.sender = sender or self._send
+        self.wheel = TimerWheel(tick, slots)
+        self.stats = {'fired': 0, 'sent': 0, 'failed': 0, 'missed': 0, 'skipped': 0,
+                      'batches': 0, 'clock_jumps': 0}
+        self.lateness = deque(maxlen=10000)         # Seconds late per recent on-time send
+        self.missed_lateness = deque(maxlen=1000)   # Seconds late per coalesced misfire
+        self._speakers = {}
+        self._actions = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    def _send(self, ip: str, command: str) -> Optional[Dict]:
+        speaker = self._speakers.get(ip)
+        if speaker is None:
+            speaker = self._speakers[ip] = JAMSpeaker(ip)
+        return speaker.send_command(command)
+
+    def schedule(self, ip: str, command: str, at: float, every: Optional[float] = None,
+                 misfire: str = MISFIRE_COALESCE) -> int:
+        """Schedule command for ip at epoch time `at`, repeating every `every` seconds"""
+        if misfire not in (MISFIRE_COALESCE, MISFIRE_SKIP):
+            raise ValueError(f"Unknown misfire policy: {misfire}")
+        if every is not None and every <= 0:
+            raise ValueError("every must be positive")
+        return self._add(ScheduledAction(next(self._ids), ip, command, at, every, misfire))
+
+    def schedule_daily(self, ip: str, command: str, hhmm: str,
+                       misfire: str = MISFIRE_SKIP) -> int:
+        """Schedule command every day at local time HH:MM
+
+        The next fire is recomputed in local time each day, so the routine
+        stays at HH:MM across DST changes.
+        """
+        hour, minute = (int(part) for part in hhmm.split(':'))
+        if misfire not in (MISFIRE_COALESCE, MISFIRE_SKIP):
+            raise ValueError(f"Unknown misfire policy: {misfire}")
+        at = _next_local_time(hour, minute, time.time())
+        return self._add(ScheduledAction(next(self._ids), ip, command, at, None, misfire,
+                                         daily=(hour, minute)))
+
+    def _add(self, action: ScheduledAction) -> int:
+        with self._lock:
+            self._actions[action.id] = action
+            self.wheel.add(action)
+        self._wake.set()
+        return action.id
+
+    def cancel(self, action_id: int) -> bool:
+        """Cancel a scheduled action (lazy removal from the wheel)"""
+        with self._lock:
+            action = self._actions.pop(action_id, None)
+        if action is None:
+            return False
+        action.cancelled = True
+        return True
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._actions)
+
+    def start(self):
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        last_wall = time.time()
+        last_mono = time.monotonic()
+        while not self._stop.is_set():
+            with self._lock:
+                if self.wheel.count:
+                    # Sleep to the next tick boundary
+                    timeout = self.wheel.tick - (time.time() % self.wheel.tick)
+                else:
+                    timeout = None
+            self._wake.wait(timeout)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+
+            wall = time.time()
+            mono = time.monotonic()
+            drift = (wall - last_wall) - (mono - last_mono)
+            last_wall, last_mono = wall, mono
+            if abs(drift) > self.GRACE:
+                self.stats['clock_jumps'] += 1
+
+            self._process(wall)
+
+    def _process(self, now: float):
+        """Collect due actions, apply misfire policy, reschedule and dispatch"""
+        tick = self.wheel.tick_for(now)
+        with self._lock:
+            if self.wheel.current is not None and tick < self.wheel.current:
+                self.wheel.rewind(tick)
+            due = self.wheel.advance(tick)
+
+            batch = []
+            for action in due:
+                if action.when > now:
+                    # Released a hair early (clock resolution): wait for the next tick
+                    self.wheel.add(action)
+                    continue
+                # `when` is captured here, before a recurring action is moved on
+                missed = now - action.when > self.GRACE
+                if missed:
+                    self.stats['missed'] += 1
+                    if action.misfire == MISFIRE_SKIP:
+                        self.stats['skipped'] += 1
+                    else:
+                        batch.append((action.ip, action.command, action.when, True))
+                else:
+                    batch.append((action.ip, action.command, action.when, False))
+
+                if action.daily:
+                    action.when = _next_local_time(*action.daily, now)
+                    self.wheel.add(action)
+                elif action.every:
+                    # Next occurrence strictly after now; missed ones are not replayed
+                    periods = max(1, int((now - action.when) // action.every) + 1)
+                    action.when += periods * action.every
+                    self.wheel.add(action)
+                else:
+                    self._actions.pop(action.id, None)
+
+        if batch:
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Tuple[str, str, float, bool]]):
+        """Send a batch of (ip, command, when, missed) concurrently, once per (ip, command)"""
+        unique = {}
+        for ip, command, when, missed in batch:
+            unique.setdefault((ip, command), (when, missed))
+        self.stats['fired'] += len(batch)
+        self.stats['batches'] += 1
+        for (ip, command), (when, missed) in unique.items():
+            if self._executor:
+                future = self._executor.submit(self._send_due, ip, command, when, missed)
+            else:
+                future = Future()
+                try:
+                    future.set_result(self._send_due(ip, command, when, missed))
+                except Exception as e:
+                    future.set_exception(e)
+            future.add_done_callback(functools.partial(self._sent, ip, command))
+
+    def _send_due(self, ip: str, command: str, when: float, missed: bool) -> Optional[Dict]:
+        """Executor job: note how late the send really starts, then send"""
+        late = time.time() - when
+        (self.missed_lateness if missed else self.lateness).append(late)
+        return self.sender(ip, command)
+
+    def _sent(self, ip: str, command: str, future: Future):
+        """Done callback: count the outcome and report failures"""
+        error = future.exception()
+        ok = error is None and future.result() is not None
+        with self._lock:
+            self.stats['sent' if ok else 'failed'] += 1
+        if not ok:
+            print(f"   Scheduled {command} for {ip} failed{f': {error}' if error else ''}")
+
+
+def _next_local_time(hour: int, minute: int, after: float) -> float:
+    """Epoch time of the next local HH:MM strictly after `after`"""
+    day = datetime.fromtimestamp(after).date()
+    while True:
+        candidate = datetime(day.year, day.month, day.day, hour, minute).timestamp()
+        if candidate > after:
+            return candidate
+        day += timedelta(days=1)
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def bench_scheduler(count: int = 10000, spread: float = 0.0) -> Dict[str, float]:
+    """Measure insert and dispatch throughput and lateness with a no-op sender
+
+    With spread=0 every action is due in the same tick, so dispatch_per_sec
+    is how fast the scheduler drains a burst (due time to last send) and
+    lateness includes the time actions wait in the executor. A spread
+    (seconds) spreads the load to measure precision under a steady rate.
+    """
+    sent = []
+    lock = threading.Lock()
+
+    def sender(ip, command):
+        with lock:
+            sent.append(time.time())
+        return {}
+
+    scheduler = SpeakerScheduler(sender=sender, tick=0.01)
+    start = time.time() + 0.5
+
+    t0 = time.perf_counter()
+    for i in range(count):
+        scheduler.schedule(f"10.0.{i // 250}.{i % 250 + 1}", "setPlayerCmd:vol:20",
+                           start + (i % 1000) * spread / 1000)
+    insert_time = time.perf_counter() - t0
+
+    with scheduler:
+        deadline = time.time() + spread + 5
+        while scheduler.pending() and time.time() < deadline:
+            time.sleep(0.05)
+    dispatch_time = (max(sent) - start) if sent else 0.0
+
+    return {
+        'actions': count,
+        'inserts_per_sec': count / insert_time if insert_time else 0.0,
+        'sent': scheduler.stats['sent'],
+        'failed': scheduler.stats['failed'],
+        'batches': scheduler.stats['batches'],
+        'dispatch_per_sec': len(sent) / dispatch_time if dispatch_time > 0 else 0.0,
+        'lateness_min_ms': min(scheduler.lateness, default=0.0) * 1000,
+        'lateness_p50_ms': _percentile(scheduler.lateness, 50) * 1000,
+        'lateness_p99_ms': _percentile(scheduler.lateness, 99) * 1000,
+    }
+
+
+def load_routines(path: str) -> List[Tuple[str, str, str]]:
+    """Read 'HH:MM IP COMMAND' lines (# comments allowed)"""
+    routines = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            hhmm, ip, command = line.split(None, 2)
+            routines.append((hhmm, ip, command))
+    return routines
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ['-h', '--help']:
+        print("JAM WiFi Speaker Scheduler")
+        print("=" * 60)
+        print()
+        print("Usage:")
+        print("  python scheduler.py routines.txt     # Run daily routines")
+        print("  python scheduler.py --bench [N]      # Benchmark N actions")
+        print()
+        print("routines.txt format (one per line, local time):")
+        print("  07:00 192.168.1.100 setPlayerCmd:vol:15")
+        print("  09:00 192.168.1.100 setPlayerCmd:play")
+        print("  22:00 192.168.1.100 setPlayerCmd:pause")
+        sys.exit(0)
+
+    if sys.argv[1] == '--bench':
+        count = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+        print(f"⏱️  Benchmarking scheduler with {count} actions...")
+        results = bench_scheduler(count)
+        for key, value in results.items():
+            print(f"   {key}: {value:.1f}" if isinstance(value, float) else f"   {key}: {value}")
+        return
+
+    routines = load_routines(sys.argv[1])
+    scheduler = SpeakerScheduler()
+    for hhmm, ip, command in routines:
+        scheduler.schedule_daily(ip, command, hhmm)
+        print(f"📅 {hhmm} {ip} {command}")
+
+    print(f"\n✅ {len(routines)} routine(s) scheduled (Ctrl+C to exit)")
+    with scheduler:
+        try:
+            while True:
+                time.sleep(60)
+        except KeyboardInterrupt:
+            print()
+    print(f"Stats: {scheduler.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,11 @@ import json
 import sys
 import time
 
+try:
+    from locate import locate_by_mac, status_macs
+except ImportError:     # requests not installed: fall back to manual lookup
+    locate_by_mac = None
+
 SPEAKER_IP = "10.10.10.254"
 BASE_URL = f"http://{SPEAKER_IP}/httpapi.asp"
 
@@ -22,7 +27,7 @@ def http_get(url, timeout=10):
         return None
 
 def check_speaker():
-    """Check if speaker is accessible"""
+    """Check if speaker is accessible, returns its status (with MAC) or None"""
     print("=" * 70)
     print("Checking speaker connection...")
     print("=" * 70)
@@ -37,13 +42,13 @@ def check_speaker():
             print(f"   Name: {data.get('DeviceName', 'Unknown')}")
             print(f"   MAC: {data.get('MAC', 'Unknown')}")
             print(f"   Firmware: {data.get('firmware', 'Unknown')}")
-            return True
+            return data
         except:
             print(f"✅ Speaker responding")
-            return True
+            return {"raw": result}
     else:
         print("❌ Cannot reach speaker at 10.10.10.254")
-        return False
+        return None
 
 def set_device_name(name):
     """Set the device name"""
@@ -153,6 +158,23 @@ def wait_for_connection(ssid):
 
     print("\n")
 
+def locate_new_ip(macs, ssid, timeout=90):
+    """Find the speaker on the home network by the MACs recorded before handover"""
+    print("\n" + "=" * 70)
+    print("Finding speaker on your network...")
+    print("=" * 70)
+    print(f"\nReconnect this computer to: {ssid}")
+    input("Press Enter once you are connected... ")
+    print(f"\n🔍 Looking for MAC {', '.join(sorted(macs))} (up to {timeout}s)...")
+
+    start = time.monotonic()
+    ip = locate_by_mac(macs, timeout=timeout)
+    if ip:
+        print(f"✅ Speaker joined as {ip} ({time.monotonic() - start:.1f}s)")
+    else:
+        print("⚠️  Speaker not found yet (it may still be connecting)")
+    return ip
+
 def main():
     print("=" * 70)
     print("JAM WiFi Speaker - FIXED Setup")
@@ -160,8 +182,9 @@ def main():
     print("=" * 70)
     print()
 
-    # Check speaker
-    if not check_speaker():
+    # Check speaker (and remember its MAC to find it again after handover)
+    status = check_speaker()
+    if not status:
         print("\nMake sure:")
         print("  1. Speaker is in pairing mode (WiFi LED blinking)")
         print("  2. You are connected to the speaker's WiFi hotspot")
@@ -201,23 +224,39 @@ def main():
 
     # Configure WiFi using the CORRECT command from decompiled app
     if configure_wifi_correct(ssid, password):
-        wait_for_connection(ssid)
+        # The station interface may report its MAC as STA_MAC/ETH_MAC, so keep all
+        macs = status_macs(status) if locate_by_mac else set()
+        speaker_ip = None
+        if macs:
+            speaker_ip = locate_new_ip(macs, ssid)
+        else:
+            wait_for_connection(ssid)
 
         print("=" * 70)
         print("✅ Setup Complete!")
         print("=" * 70)
         print()
-        print("Next steps:")
-        print(f"  1. Reconnect your Mac to: {ssid}")
-        print("  2. Wait 20-30 seconds for speaker to fully connect")
-        print("  3. Find the speaker:")
-        print("     ./venv/bin/python3 discover_speakers.py")
-        if name:
-            print(f"     (Look for device named: {name})")
-        print("  4. Test it:")
-        print("     ./venv/bin/python3 test_speaker.py <SPEAKER_IP>")
-        print()
-        print("💡 Check your router's DHCP list to find the speaker's IP")
+        if speaker_ip:
+            print(f"Speaker is at: {speaker_ip}")
+            print()
+            print("Test it:")
+            print(f"  ./venv/bin/python3 test_speaker.py {speaker_ip}")
+            print()
+        else:
+            print("Next steps:")
+            print(f"  1. Reconnect your Mac to: {ssid}")
+            print("  2. Wait 20-30 seconds for speaker to fully connect")
+            print("  3. Find the speaker:")
+            if macs:
+                print(f"     ./venv/bin/python3 locate.py {' '.join(sorted(macs))}")
+            else:
+                print("     ./venv/bin/python3 discover_speakers.py")
+            if name:
+                print(f"     (Look for device named: {name})")
+            print("  4. Test it:")
+            print("     ./venv/bin/python3 test_speaker.py <SPEAKER_IP>")
+            print()
+            print("💡 Check your router's DHCP list to find the speaker's IP")
     else:
         print("\n❌ Setup failed")
         sys.exit(1)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Opt-in tracing for scan and command phases
+Records timed spans (SSDP wait, TCP connect, HTTP read, JSON parse...) and
+exports them as Chrome trace-event JSON (open in chrome://tracing or
+ui.perfetto.dev). When tracing is off, span() returns a shared no-op object.
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from typing import List
+
+
+class _NoopSpan:
+    """Returned by span() when tracing is disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    """One timed phase; attributes can be added while it runs"""
+
+    __slots__ = ('tracer', 'name', 'attrs', 'start')
+
+    def __init__(self, tracer: 'Tracer', name: str, attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None and 'outcome' not in self.attrs:
+            self.attrs['outcome'] = f"error: {exc_type.__name__}"
+        self.tracer._record(self, end)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """Collects finished spans in memory"""
+
+    def __init__(self):
+        self.events = []
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+
+    def _record(self, span: Span, end: float):
+        # list.append is atomic, so threads can record without a lock
+        self.events.append({
+            'name': span.name,
+            'ph': 'X',
+            'ts': round((span.start - self._origin) * 1e6, 1),
+            'dur': round((end - span.start) * 1e6, 1),
+            'pid': self._pid,
+            'tid': threading.get_ident(),
+            'args': span.attrs,
+        })
+
+    def export(self, path: str):
+        """Write Chrome trace-event JSON"""
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+
+
+_tracer = None
+
+
+def span(name: str, **attrs):
+    """Context manager timing a phase; near free when tracing is disabled"""
+    if _tracer is None:
+        return _NOOP
+    return Span(_tracer, name, attrs)
+
+
+def enable() -> Tracer:
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def disable():
+    global _tracer
+    _tracer = None
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+def tracing_from_args(argv: List[str]) -> List[str]:
+    """Handle --trace FILE and return the remaining args
+
+    Enables tracing and writes the trace to FILE when the program exits.
+    """
+    args = list(argv)
+    if '--trace' in args:
+        i = args.index('--trace')
+        if i + 1 >= len(args) or args[i + 1].startswith('--'):
+            print("❌ --trace needs a file name")
+            sys.exit(1)
+        path = args[i + 1]
+        del args[i:i + 2]
+        tracer = enable()
+        atexit.register(tracer.export, path)
+        print(f"⏱️  Tracing to {path}")
+    return args
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Pluggable network transport with record and replay
+JAMSpeaker and the scanners send all traffic through a transport, so a
+session against real speakers can be captured to a file and replayed
+offline later - at original speed or as fast as possible.
+"""
+
+import atexit
+import errno
+import gzip
+import json
+import socket
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from typing import List, Optional, Tuple
+
+import requests
+
+CAPTURE_VERSION = 1
+
+
+class CapturedResponse:
+    """Minimal stand-in for requests.Response built from a capture"""
+
+    def __init__(self, status_code: int, text: str, elapsed: float = 0.0):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.elapsed = elapsed
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class LiveTransport:
+    """Talks to the real network"""
+
+    def local_ip(self) -> Optional[str]:
+        """Our address on the LAN (used to pick the subnet to scan)"""
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            s.connect(('8.8.8.8', 80))
+            return s.getsockname()[0]
+        except OSError:
+            return None
+        finally:
+            s.close()
+
+    def get(self, url: str, timeout: float):
+        """HTTP GET, returns a response with status_code, text and json()"""
+        return requests.get(url, timeout=timeout)
+
+    def connect(self, ip: str, port: int, timeout: float) -> int:
+        """TCP connect probe, returns 0 on success or an errno like connect_ex"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            return sock.connect_ex((ip, port))
+        finally:
+            sock.close()
+
+    def ssdp_search(self, request: str, address: Tuple[str, int],
+                    timeout: float) -> List[Tuple[str, str]]:
+        """Send an SSDP M-SEARCH and collect (ip, response) until timeout"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.settimeout(timeout)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 2)
+        responses = []
+        try:
+            sock.sendto(request.encode(), address)
+            while True:
+                try:
+                    data, addr = sock.recvfrom(4096)
+                    responses.append((addr[0], data.decode('utf-8', errors='ignore')))
+                except socket.timeout:
+                    break
+        finally:
+            sock.close()
+        return responses
+
+    def close(self):
+        pass
+
+
+class RecordingTransport:
+    """Wraps another transport and writes every exchange to a capture file
+
+    The capture is JSON lines (gzip compressed if the name ends in .gz):
+    a header line (with the recording host's LAN address), then one record
+    per request with its start offset, duration and outcome.
+    """
+
+    def __init__(self, path: str, inner=None):
+        self.path = path
+        self.inner = inner or LiveTransport()
+        self._file = _open_capture(path, 'wt')
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._local_ip = self.inner.local_ip()
+        self._write({'version': CAPTURE_VERSION, 'started': time.time(),
+                     'local_ip': self._local_ip})
+
+    def local_ip(self) -> Optional[str]:
+        return self._local_ip
+
+    def _write(self, record: dict):
+        line = json.dumps(record, separators=(',', ':'))
+        with self._lock:
+            if self._file:
+                self._file.write(line + '\n')
+
+    def _record(self, kind: str, key: str, start: float, **fields):
+        record = {'kind': kind, 'key': key,
+                  't': round(start - self._start, 4),
+                  'elapsed': round(time.monotonic() - start, 4)}
+        record.update(fields)
+        self._write(record)
+
+    def get(self, url: str, timeout: float):
+        start = time.monotonic()
+        try:
+            response = self.inner.get(url, timeout)
+        except requests.Timeout as e:
+            self._record('http', url, start, error='timeout', message=str(e))
+            raise
+        except requests.RequestException as e:
+            self._record('http', url, start, error='connection', message=str(e))
+            raise
+        self._record('http', url, start, status=response.status_code, body=response.text)
+        return response
+
+    def connect(self, ip: str, port: int, timeout: float) -> int:
+        start = time.monotonic()
+        result = self.inner.connect(ip, port, timeout)
+        self._record('tcp', f"{ip}:{port}", start, result=result)
+        return result
+
+    def ssdp_search(self, request: str, address: Tuple[str, int],
+                    timeout: float) -> List[Tuple[str, str]]:
+        start = time.monotonic()
+        responses = self.inner.ssdp_search(request, address, timeout)
+        self._record('ssdp', f"{address[0]}:{address[1]}", start,
+                     responses=[list(r) for r in responses])
+        return responses
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+        self.inner.close()
+
+
+class ReplayTransport:
+    """Answers requests from a capture file instead of the network
+
+    Requests are matched by kind and key (URL, ip:port) in the order they
+    were recorded. With realtime=True each answer takes as long as it did
+    originally; otherwise answers are immediate.
+    """
+
+    def __init__(self, path: str, realtime: bool = True, speed: float = 1.0):
+        self.path = path
+        self.realtime = realtime
+        self.speed = speed
+        self.misses = 0
+        self._records = defaultdict(deque)
+        self._lock = threading.Lock()
+        with _open_capture(path, 'rt') as f:
+            header = json.loads(f.readline() or '{}')
+            if header.get('version') != CAPTURE_VERSION:
+                raise ValueError(f"Unsupported capture file: {path}")
+            self._local_ip = header.get('local_ip')
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._records[(record['kind'], record['key'])].append(record)
+
+    def local_ip(self) -> Optional[str]:
+        """The recording host's address, so replay scans the same subnet"""
+        return self._local_ip
+
+    def _next(self, kind: str, key: str) -> Optional[dict]:
+        with self._lock:
+            queue = self._records.get((kind, key))
+            if queue:
+                return queue.popleft()
+            self.misses += 1
+            return None
+
+    def _wait(self, record: dict):
+        if self.realtime and record.get('elapsed'):
+            time.sleep(record['elapsed'] / self.speed)
+
+    def get(self, url: str, timeout: float):
+        record = self._next('http', url)
+        if record is None:
+            raise requests.ConnectionError(f"Not in capture: {url}")
+        self._wait(record)
+        if record.get('error') == 'timeout':
+            raise requests.Timeout(record.get('message', ''))
+        if record.get('error'):
+            raise requests.ConnectionError(record.get('message', ''))
+        return CapturedResponse(record['status'], record.get('body', ''), record['elapsed'])
+
+    def connect(self, ip: str, port: int, timeout: float) -> int:
+        record = self._next('tcp', f"{ip}:{port}")
+        if record is None:
+            return errno.ECONNREFUSED
+        self._wait(record)
+        return record['result']
+
+    def ssdp_search(self, request: str, address: Tuple[str, int],
+                    timeout: float) -> List[Tuple[str, str]]:
+        record = self._next('ssdp', f"{address[0]}:{address[1]}")
+        if record is None:
+            return []
+        self._wait(record)
+        return [tuple(r) for r in record['responses']]
+
+    def close(self):
+        pass
+
+
+def _open_capture(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+_transport = LiveTransport()
+
+
+def get_transport():
+    """Transport used when none is passed explicitly"""
+    return _transport
+
+
+def set_transport(transport):
+    """Replace the default transport (returns the previous one)"""
+    global _transport
+    previous, _transport = _transport, transport
+    return previous
+
+
+def pop_option(args: List[str], flag: str) -> str:
+    """Remove `flag VALUE` from args and return VALUE (exits if it is missing)"""
+    i = args.index(flag)
+    if i + 1 >= len(args) or args[i + 1].startswith('--'):
+        print(f"❌ {flag} needs a file name")
+        sys.exit(1)
+    value = args[i + 1]
+    del args[i:i + 2]
+    return value
+
+
+def transport_from_args(argv: List[str]) -> List[str]:
+    """Handle --record FILE / --replay FILE [--fast] and return the remaining args
+
+    Installs the matching default transport; recordings are closed at exit.
+    """
+    args = list(argv)
+    transport = None
+    if '--record' in args:
+        transport = RecordingTransport(pop_option(args, '--record'))
+        print(f"⏺️  Recording traffic to {transport.path}")
+    if '--replay' in args:
+        fast = '--fast' in args
+        transport = ReplayTransport(pop_option(args, '--replay'), realtime=not fast)
+        if fast:
+            args.remove('--fast')
+        print(f"▶️  Replaying traffic from {transport.path}{' (fast)' if fast else ''}")
+    if transport:
+        set_transport(transport)
+        atexit.register(transport.close)
+    return args
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ['-h', '--help']:
+        print("Usage: python transport.py <capture-file>   # Summarize a capture")
+        print()
+        print("Record or replay with the other tools:")
+        print("  python scan_network.py --record scan.jsonl.gz")
+        print("  python scan_network.py --replay scan.jsonl.gz --fast")
+        sys.exit(0)
+
+    counts = defaultdict(int)
+    total = defaultdict(float)
+    with _open_capture(sys.argv[1], 'rt') as f:
+        f.readline()
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                counts[record['kind']] += 1
+                total[record['kind']] += record.get('elapsed', 0.0)
+    for kind in sorted(counts):
+        print(f"{kind}: {counts[kind]} request(s), {total[kind]:.2f}s total")
+
+
+if __name__ == "__main__":
+    main()
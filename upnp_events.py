@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+UPnP event subscriptions for JAM WiFi speakers
+Subscribes to AVTransport and RenderingControl (GENA) events so playback
+changes are pushed to us instead of polling getPlayerStatus.
+"""
+
+import socket
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Callable, Dict, Optional
+from urllib.parse import urljoin
+
+import requests
+
+from discover_speakers import JAMSpeakerDiscovery, JAMSpeaker
+
+# Services we subscribe to, keyed by a short name
+EVENT_SERVICES = {
+    'AVTransport': 'urn:schemas-upnp-org:service:AVTransport:1',
+    'RenderingControl': 'urn:schemas-upnp-org:service:RenderingControl:1',
+}
+
+# UPnP TransportState -> getPlayerStatus "status"
+TRANSPORT_STATES = {
+    'PLAYING': 'play',
+    'PAUSED_PLAYBACK': 'pause',
+    'STOPPED': 'stop',
+    'NO_MEDIA_PRESENT': 'stop',
+    'TRANSITIONING': 'load',
+}
+
+# DIDL-Lite metadata fields -> getPlayerStatus keys (hex encoded like the API)
+METADATA_FIELDS = {
+    'title': 'Title',
+    'artist': 'Artist',
+    'album': 'Album',
+}
+
+StatusCallback = Callable[[str, Dict], None]
+
+
+def _local(tag: str) -> str:
+    """Strip the XML namespace from a tag"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _hms_to_ms(value: str) -> Optional[str]:
+    """Convert UPnP H:MM:SS(.fff) to milliseconds as a string"""
+    try:
+        hours, minutes, seconds = value.split(':')
+        total = (int(hours) * 3600 + int(minutes) * 60 + float(seconds)) * 1000
+        return str(int(total))
+    except ValueError:
+        return None
+
+
+def fetch_device_description(location: str, timeout: float = 5) -> Dict[str, str]:
+    """Fetch a device description and return service name -> event subscription URL"""
+    response = requests.get(location, timeout=timeout)
+    response.raise_for_status()
+    root = ET.fromstring(response.content)
+
+    base = location
+    for element in root.iter():
+        if _local(element.tag) == 'URLBase' and element.text:
+            base = element.text.strip()
+            break
+
+    urls = {}
+    for service in root.iter():
+        if _local(service.tag) != 'service':
+            continue
+        fields = {_local(child.tag): (child.text or '').strip() for child in service}
+        for name, service_type in EVENT_SERVICES.items():
+            if fields.get('serviceType') == service_type and fields.get('eventSubURL'):
+                urls[name] = urljoin(base, fields['eventSubURL'])
+    return urls
+
+
+def parse_last_change(body: bytes) -> Dict[str, str]:
+    """Turn a GENA NOTIFY body into getPlayerStatus-style fields
+
+    Only variables present in the event are returned, so the result can be
+    merged into the last known status.
+    """
+    updates = {}
+    propertyset = ET.fromstring(body)
+    for prop in propertyset.iter():
+        if _local(prop.tag) != 'LastChange' or not prop.text:
+            continue
+        event = ET.fromstring(prop.text)
+        for variable in event.iter():
+            name = _local(variable.tag)
+            value = variable.get('val')
+            if value is None:
+                continue
+            if name == 'TransportState':
+                updates['status'] = TRANSPORT_STATES.get(value, value.lower())
+            elif name == 'Volume' and variable.get('channel', 'Master') == 'Master':
+                updates['vol'] = value
+            elif name == 'Mute' and variable.get('channel', 'Master') == 'Master':
+                updates['mute'] = '1' if value in ('1', 'true') else '0'
+            elif name == 'CurrentTrackDuration':
+                ms = _hms_to_ms(value)
+                if ms is not None:
+                    updates['totlen'] = ms
+            elif name == 'RelativeTimePosition':
+                ms = _hms_to_ms(value)
+                if ms is not None:
+                    updates['curpos'] = ms
+            elif name == 'CurrentTrackMetaData' and value:
+                updates.update(_parse_metadata(value))
+    return updates
+
+
+def _parse_metadata(didl: str) -> Dict[str, str]:
+    """Extract title/artist/album from DIDL-Lite, hex encoded like getPlayerStatus"""
+    fields = {}
+    try:
+        root = ET.fromstring(didl)
+    except ET.ParseError:
+        return fields
+    for element in root.iter():
+        key = METADATA_FIELDS.get(_local(element.tag))
+        if key and element.text and key not in fields:
+            fields[key] = element.text.encode('utf-8').hex()
+    return fields
+
+
+class _Subscription:
+    """State of one GENA subscription"""
+
+    def __init__(self, ip: str, service: str, url: str):
+        self.ip = ip
+        self.service = service
+        self.url = url
+        self.sid = None
+        self.granted = 0        # Lifetime the speaker actually granted (seconds)
+        self.expires = 0.0
+        self.failures = 0       # Consecutive failed (re)subscribes
+        self.retry_at = 0.0     # Next attempt after a failure (0 = not failing)
+
+
+class _NotifyHandler(BaseHTTPRequestHandler):
+    """Receives NOTIFY requests from speakers"""
+
+    def do_NOTIFY(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        self.send_response(200)
+        self.end_headers()
+        self.server.listener._handle_notify(self.headers.get('SID'), body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class UPnPEventListener:
+    """Subscribe to speaker events and keep a pushed copy of player status
+
+    The callback is called as callback(ip, status) with the merged
+    getPlayerStatus-style dict every time an event changes something.
+    """
+
+    TIMEOUT = 1800        # Requested subscription lifetime (seconds)
+    RENEW_MARGIN = 0.5    # Renew when this fraction of the lifetime is left
+    PENDING_TTL = 10      # Keep NOTIFYs for a not-yet-registered SID this long
+    RETRY_MIN = 5         # First retry delay after a failed (re)subscribe, doubled per failure
+    RETRY_MAX = 300
+
+    def __init__(self, callback: Optional[StatusCallback] = None, port: int = 0):
+        self.callback = callback
+        self.port = port
+        self.status = {}            # ip -> merged player status
+        self._subscriptions = {}    # sid -> _Subscription
+        self._retrying = []         # _Subscriptions that never got a SID, retried with backoff
+        self._pending = {}          # sid -> [(received, body)] for SIDs not registered yet
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._server = None
+        self._threads = []
+
+    def start(self):
+        """Start the callback HTTP server and the renewal thread"""
+        self._server = _ThreadingHTTPServer(('', self.port), _NotifyHandler)
+        self._server.listener = self
+        self.port = self._server.server_address[1]
+        self._stop.clear()
+        for target in (self._server.serve_forever, self._renew_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Unsubscribe everything and shut the server down"""
+        self._stop.set()
+        with self._lock:
+            subscriptions = list(self._subscriptions.values())
+            self._subscriptions.clear()
+            self._retrying.clear()
+        for sub in subscriptions:
+            try:
+                requests.request('UNSUBSCRIBE', sub.url, headers={'SID': sub.sid}, timeout=2)
+            except requests.RequestException:
+                pass
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self._threads = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def subscribe(self, ip: str, location: Optional[str] = None) -> int:
+        """Subscribe to a speaker's events, returns number of services subscribed
+
+        If no SSDP LOCATION is known, the usual LinkPlay description URL is tried.
+        Services that fail to subscribe are retried in the background.
+        """
+        location = location or f"http://{ip}:49152/description.xml"
+        urls = fetch_device_description(location)
+        subscribed = 0
+        for service, url in urls.items():
+            sub = _Subscription(ip, service, url)
+            if self._subscribe(sub):
+                subscribed += 1
+            else:
+                self._schedule_retry(sub)
+        return subscribed
+
+    def _callback_url(self, ip: str) -> str:
+        """URL the speaker should send events to (our address on its network)"""
+        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            s.connect((ip, 1900))
+            local_ip = s.getsockname()[0]
+        finally:
+            s.close()
+        return f"http://{local_ip}:{self.port}/events"
+
+    def _subscribe(self, sub: _Subscription) -> bool:
+        """Create a new subscription"""
+        try:
+            callback = self._callback_url(sub.ip)
+        except OSError as e:
+            # No route to the speaker (e.g. we are off the network)
+            print(f"   Subscribe to {sub.service} on {sub.ip} failed: {e}")
+            return False
+        headers = {
+            'CALLBACK': f"<{callback}>",
+            'NT': 'upnp:event',
+            'TIMEOUT': f"Second-{self.TIMEOUT}",
+        }
+        try:
+            response = requests.request('SUBSCRIBE', sub.url, headers=headers, timeout=5)
+        except requests.RequestException as e:
+            print(f"   Subscribe to {sub.service} on {sub.ip} failed: {e}")
+            return False
+        if response.status_code != 200 or not response.headers.get('SID'):
+            print(f"   Subscribe to {sub.service} on {sub.ip} failed: HTTP {response.status_code}")
+            return False
+        self._accept(sub, response)
+        return True
+
+    def _renew(self, sub: _Subscription) -> bool:
+        """Renew an existing subscription, resubscribing if the speaker forgot it
+
+        The subscription stays registered until a replacement succeeds; if
+        both attempts fail it is retried with backoff. After a fresh
+        subscription or a recovery the speaker is re-seeded, since events
+        may have been missed.
+        """
+        recovering = sub.failures > 0
+        response = None
+        if sub.sid:
+            headers = {'SID': sub.sid, 'TIMEOUT': f"Second-{self.TIMEOUT}"}
+            try:
+                response = requests.request('SUBSCRIBE', sub.url, headers=headers, timeout=5)
+            except requests.RequestException:
+                pass
+        if response is not None and response.status_code == 200:
+            self._accept(sub, response)
+            if recovering:
+                self.seed(sub.ip)
+            return True
+        if self._subscribe(sub):
+            self.seed(sub.ip)
+            return True
+        self._schedule_retry(sub)
+        return False
+
+    def _schedule_retry(self, sub: _Subscription):
+        """Back off before the next attempt (doubling up to RETRY_MAX)"""
+        sub.failures += 1
+        delay = min(self.RETRY_MAX, self.RETRY_MIN * 2 ** (sub.failures - 1))
+        sub.retry_at = time.monotonic() + delay
+        with self._lock:
+            if sub.sid is None and sub not in self._retrying:
+                self._retrying.append(sub)
+
+    def _accept(self, sub: _Subscription, response):
+        """Record SID and expiry from a SUBSCRIBE response"""
+        previous = sub.sid
+        sub.sid = response.headers.get('SID', sub.sid)
+        timeout = response.headers.get('TIMEOUT', '')
+        try:
+            seconds = int(timeout.split('-', 1)[1])
+        except (IndexError, ValueError):
+            seconds = self.TIMEOUT
+        sub.granted = seconds
+        sub.expires = time.monotonic() + seconds
+        sub.failures = 0
+        sub.retry_at = 0.0
+        with self._lock:
+            if previous and previous != sub.sid:
+                self._subscriptions.pop(previous, None)
+            if sub in self._retrying:
+                self._retrying.remove(sub)
+            self._subscriptions[sub.sid] = sub
+            # The initial full-state NOTIFY can beat the SUBSCRIBE response here
+            pending = self._pending.pop(sub.sid, [])
+        for _, body in pending:
+            self._handle_notify(sub.sid, body)
+
+    def _renew_loop(self):
+        """Renew subscriptions before they expire and retry failed ones"""
+        while not self._stop.wait(5):
+            now = time.monotonic()
+            with self._lock:
+                due = [sub for sub in list(self._subscriptions.values()) + self._retrying
+                       if (sub.retry_at <= now if sub.retry_at
+                           else sub.expires - now < sub.granted * self.RENEW_MARGIN)]
+                # Drop buffered NOTIFYs whose SID never got registered
+                for sid in [sid for sid, items in self._pending.items()
+                            if now - items[-1][0] > self.PENDING_TTL]:
+                    del self._pending[sid]
+            for sub in due:
+                if self._stop.is_set():
+                    break
+                # One unreachable speaker must not kill renewals for the others
+                try:
+                    self._renew(sub)
+                except OSError as e:
+                    print(f"   Renewing {sub.service} on {sub.ip} failed: {e}")
+                    self._schedule_retry(sub)
+
+    def _handle_notify(self, sid: Optional[str], body: bytes):
+        """Merge an incoming event into the speaker's status"""
+        with self._lock:
+            sub = self._subscriptions.get(sid)
+            if sub is None:
+                if sid:
+                    pending = self._pending.setdefault(sid, [])
+                    if len(pending) < 16:
+                        pending.append((time.monotonic(), body))
+                return
+        try:
+            updates = parse_last_change(body)
+        except ET.ParseError:
+            return
+        if not updates:
+            return
+        with self._lock:
+            status = self.status.setdefault(sub.ip, {})
+            changed = any(status.get(key) != value for key, value in updates.items())
+            status.update(updates)
+            snapshot = dict(status)
+        if changed and self.callback:
+            self.callback(sub.ip, snapshot)
+
+    def seed(self, ip: str):
+        """Fill in the status with one getPlayerStatus poll
+
+        Values already received from events win over the polled ones.
+        """
+        status = JAMSpeaker(ip).get_player_status()
+        if not status:
+            return
+        with self._lock:
+            merged = dict(status)
+            merged.update(self.status.get(ip, {}))
+            self.status[ip] = merged
+            snapshot = dict(merged)
+        if self.callback:
+            self.callback(ip, snapshot)
+
+
+def main():
+    print("=" * 60)
+    print("JAM WiFi Speaker Event Monitor")
+    print("=" * 60)
+    print()
+
+    locations = JAMSpeakerDiscovery.discover_upnp_locations()
+    if len(sys.argv) > 1:
+        locations = {ip: locations.get(ip, '') for ip in sys.argv[1:]}
+
+    if not locations:
+        print("\n❌ No JAM WiFi speakers found via UPnP.")
+        print("   Usage: python upnp_events.py [SPEAKER_IP ...]")
+        sys.exit(1)
+
+    def on_status(ip, status):
+        print(f"🎵 {ip}: status={status.get('status', '?')} "
+              f"vol={status.get('vol', '?')} mute={status.get('mute', '?')}")
+
+    with UPnPEventListener(on_status) as listener:
+        print(f"\n📡 Listening for events on port {listener.port}")
+        for ip, location in locations.items():
+            try:
+                count = listener.subscribe(ip, location or None)
+                listener.seed(ip)
+                print(f"   {ip}: subscribed to {count} service(s)")
+            except Exception as e:
+                print(f"   {ip}: could not subscribe: {e}")
+
+        print("\nWaiting for events (Ctrl+C to exit)...\n")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print()
+
+
+if __name__ == "__main__":
+    main()